@@ -1,16 +1,19 @@
 from agno.agent import Agent, RunResponseEvent
-from agno.models.google import Gemini
 from agno.utils.pprint import pprint_run_response
 import os
 import dotenv
-from typing import Iterator
+from typing import Iterator, List
 import asyncio
 from utility.utils import shared_memory, shared_storage
+from utility.gemini_client import SharedGemini
+from utility.tracing import TracedAgentMixin, traced_entrypoint
+from utility.project_profile import ProjectSessionMixin, run_session, shared_project_profiles
 
 dotenv.load_dotenv()
 
 BOQ_AGENT_INSTRUCTIONS = [
     "Your Role and Goal: You are an expert Quantity Surveyor. Your goal is to translate project data into a structured Bill of Quantities (BoQ) for any type of building, following standard industry practices.",
+    "Project Brief: Use the Project Profile gathered during the client interview (at the end of these instructions) as the project brief. Do not reconstruct the brief from the chat history.",
     "Multi-Floor Plan Handling: If the project data includes multiple floor plans, generate a separate Bill of Quantities for each floor plan.",
     "Step 1: Initial Documentation Review - Thoroughly review all provided project data, including architectural drawings, specifications, and any other relevant documents. Identify key aspects such as building type (e.g., residential, commercial, industrial), scale (size, number of floors), rooms and their functions, and any special features or requirements (e.g., custom installations, unique structural elements).",
     "Step 2: Itemization and Categorization - Itemize all materials, labor, and tasks required for the project, ensuring every element of the construction process is covered, from site preparation to final finishes. Categorize them into standard construction categories, including but not limited to: Preliminaries (site preparation, temporary facilities, site management), Substructure (foundations, basement construction, ground works), Superstructure (structural frame, floors, roofs, columns), Exterior Finishes (external walls, windows, doors, cladding), Interior Finishes (internal walls, floors, ceilings, painting, tiling), Services (MEP) (mechanical, electrical, plumbing systems, e.g., HVAC, lighting, water supply), and Special Features (unique or custom elements specific to the project, e.g., green roofs, bespoke fittings). Ensure all items are comprehensively accounted for and correctly categorized.",
@@ -19,21 +22,30 @@ BOQ_AGENT_INSTRUCTIONS = [
     "Step 5: Final Compilation - Organize each Bill of Quantities in a clear and structured manner. For projects with multiple floor plans, ensure each BoQ corresponds to its respective floor plan. Each BoQ should include categories with their names (e.g., 'Substructure', 'Services (MEP)'), and items within each category, including description (e.g., 'Concrete foundation slab'), quantity (e.g., '150'), and unit of measurement (e.g., 'cubic meters')."
 ]
 
-class BOQAgent(Agent):
+def boq_agent_instructions(agent: Agent) -> List[str]:
+    """
+    BOQ instructions with the session's project profile appended; agno resolves these on every run.
+    """
+    session_id, _ = run_session(agent)
+    profile = shared_project_profiles().get(session_id) if session_id else None
+    project_brief = profile.to_brief() if profile is not None else ""
+    return BOQ_AGENT_INSTRUCTIONS + [f"Project Profile:\n{project_brief or 'Not available'}"]
+
+class BOQAgent(TracedAgentMixin, ProjectSessionMixin, Agent):
     def __init__(self):
         super().__init__(
             name="BOQAgent",
             agent_id="boq_agent",
-            model=Gemini(id=os.getenv("GEMINI_MODEL")),
+            model=SharedGemini(id=os.getenv("GEMINI_MODEL")),
             memory=shared_memory(),
-            storage=shared_storage(),
+            storage=shared_storage(num_history_runs=5),
             description="BOQ agent generates detailed Bill of Quantities for construction projects based on architectural drawings, specifications, and project data. It follows industry standards for quantity surveying.",
-            instructions=BOQ_AGENT_INSTRUCTIONS,
+            instructions=boq_agent_instructions,
             
             # CHAT HISTORY CONFIG
             add_history_to_messages=True,
             num_history_runs=5,
-            read_chat_history=True,
+            read_chat_history=False,
             
             # MEMORY CONFIG
             enable_agentic_memory=True,
@@ -107,6 +119,7 @@ class BOQAgent(Agent):
             """
         )
     
+    @traced_entrypoint
     async def generate_boq(self, data: str, user_id: str = None, session_id: str = None) -> Iterator[RunResponseEvent]:
         """
         Generate Bill of Quantities based on project data.
@@ -1,11 +1,14 @@
 from agno.agent import Agent, RunResponseEvent
-from agno.models.google import Gemini
 from agno.utils.pprint import pprint_run_response
 import os
 import dotenv
 from typing import Iterator
 import asyncio
 from utility.utils import shared_memory, shared_storage
+from utility.gemini_client import SharedGemini
+from utility.tracing import TracedAgentMixin, traced_entrypoint
+from utility.session_memory import StoredChatHistoryMixin
+from utility.project_profile import ProjectSessionMixin, save_project_fact
 
 dotenv.load_dotenv()
 
@@ -17,15 +20,16 @@ INTERVIEW_AGENT_INSTRUCTIONS = [
 
     # Real-time Memory Management
     "Your most important job is to build a structured profile of the user's project in real-time.",
-    "After each user response, analyze it for key pieces of information. Use the internal `memory.save(key, value)` function to store these facts.",
+    "After each user response, analyze it for key pieces of information. Use the `save_project_fact(key, value)` tool to store these facts.",
     "Use clear, simple keys for the memory. Examples: 'building_type', 'primary_users', 'desired_style', 'budget_range'.",
+    "Prefer these keys when they fit: 'building_type', 'purpose', 'primary_users', 'peak_occupancy', 'floors', 'essential_zones', 'support_areas', 'circulation', 'location', 'site_context', 'existing_structures', 'restrictions', 'desired_style', 'desired_atmosphere', 'materials', 'special_features', 'budget_range', 'timeline'. Save a key again with the complete value when the user adds to or changes it.",
     "Only save concrete facts. Do not save conversational filler like 'I think so' or 'hmm'.",
     "Examples:",
-    "  - User: 'I want to build a small home for my family.' → Save: memory.save('building_type', 'home')",
-    "  - User: 'It will be for me, my partner, and our two kids.' → Save: memory.save('primary_users', 'family of 4')",
-    "  - User: 'I love modern, minimalist designs.' → Save: memory.save('desired_style', 'modern and minimalist')",
-    "  - User: 'I have a budget of around $300,000.' → Save: memory.save('budget_range', '300000')",
-    "  - User: 'I want a cozy cafe with a small stage for live music.' → Save: memory.save('building_type', 'cafe'), memory.save('special_features', 'small stage for live music'), memory.save('desired_atmosphere', 'cozy')",
+    "  - User: 'I want to build a small home for my family.' → Save: save_project_fact('building_type', 'home')",
+    "  - User: 'It will be for me, my partner, and our two kids.' → Save: save_project_fact('primary_users', 'family of 4')",
+    "  - User: 'I love modern, minimalist designs.' → Save: save_project_fact('desired_style', 'modern and minimalist')",
+    "  - User: 'I have a budget of around $300,000.' → Save: save_project_fact('budget_range', '300000')",
+    "  - User: 'I want a cozy cafe with a small stage for live music.' → Save: save_project_fact('building_type', 'cafe'), save_project_fact('special_features', 'small stage for live music'), save_project_fact('desired_atmosphere', 'cozy')",
     
     # Guided Interview - General Principles
     "One Question at a Time: Ask only one question per response to maintain a natural flow. Wait for the user's answer before proceeding.",
@@ -92,16 +96,17 @@ INTERVIEW_AGENT_INSTRUCTIONS = [
     "Next Steps: Suggest what's next. Example: 'The next step could be exploring initial design ideas. Would you like me to help with that?'"
 ]
 
-class InterviewAgent(Agent):
+class InterviewAgent(TracedAgentMixin, ProjectSessionMixin, StoredChatHistoryMixin, Agent):
     def __init__(self):
         super().__init__(
             name="InterviewAgent",
             agent_id="interview_agent",
-            model=Gemini(id=os.getenv("GEMINI_MODEL", "gemini-2.5-flash")),
+            model=SharedGemini(id=os.getenv("GEMINI_MODEL", "gemini-2.5-flash")),
             memory=shared_memory(),
-            storage=shared_storage(),
+            storage=shared_storage(num_history_runs=5),
             description="Interview agent interacts with clients to gather detailed architectural design requirements, including building type, number of floors, layout preferences, and MEP needs. It serves as the first step in guiding the design-to-BOQ process.",
             instructions=INTERVIEW_AGENT_INSTRUCTIONS,
+            tools=[save_project_fact],
             
             # CHAT HISTORY CONFIG
             add_history_to_messages=True,
@@ -129,6 +134,7 @@ class InterviewAgent(Agent):
             """
         )
     
+    @traced_entrypoint
     async def interview(self, data: str, user_id: str = None, session_id: str = None) -> Iterator[RunResponseEvent]:
         """
         Conduct an interview to gather architectural design requirements.
@@ -1,5 +1,4 @@
 from agno.agent import Agent, RunResponseEvent
-from agno.models.google import Gemini
 from agno.memory.v2 import Memory
 from agno.memory.v2.db.sqlite import SqliteMemoryDb
 from agno.media import Image
@@ -9,18 +8,21 @@ import dotenv
 from typing import Iterator
 import asyncio
 from utility.utils import shared_memory, shared_storage
+from utility.gemini_client import SharedGemini
+from utility.tracing import TracedAgentMixin, traced_entrypoint
+from utility.session_memory import StoredChatHistoryMixin
 
 dotenv.load_dotenv()
 
 
-class VisualizerAgent(Agent):
+class VisualizerAgent(TracedAgentMixin, StoredChatHistoryMixin, Agent):
     def __init__(self):
         super().__init__(
             name="VisualizerAgent",
             agent_id="visualizer_agent",
-            model=Gemini(id=os.getenv("GEMINI_MODEL", "gemini-2.5-flash")),
+            model=SharedGemini(id=os.getenv("GEMINI_MODEL", "gemini-2.5-flash")),
             memory=shared_memory(),
-            storage=shared_storage(),
+            storage=shared_storage(num_history_runs=3),
             description="This agent visualizes data and generates images based on the provided information.",
             instructions="""Use this agent to visualize data and generate images. It can process various types of data and create analysis of visual representations.
             You have to go in depth and analyze every part of the image every pixel in detail and return your result as expected output
@@ -72,6 +74,7 @@ class VisualizerAgent(Agent):
             """
         )
     
+    @traced_entrypoint
     def visualize(self, text: str = None, file_path: str = None, user_id: str = None, session_id: str = None) -> Iterator[RunResponseEvent]:
         """
         Visualize and analyze image data based on provided text or file path.
@@ -0,0 +1,104 @@
+"""
+Measure the connection setup overhead removed by the shared Gemini HTTP client.
+
+A local HTTPS server with a self-signed certificate stands in for the Gemini API.
+"Per-instance" mirrors the old layout where every model object owned its own client
+(one fresh TCP + TLS handshake per call after idle); "shared" reuses the pooled client
+from utility.gemini_client.
+
+Usage: python benchmarks/bench_gemini_client.py [requests]
+"""
+import os
+import ssl
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utility.gemini_client import build_http_clients
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"name": "models/gemini-2.5-flash"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_https_server(cert_dir: str) -> ThreadingHTTPServer:
+    cert_file = os.path.join(cert_dir, "cert.pem")
+    key_file = os.path.join(cert_dir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key_file, "-out", cert_file],
+        check=True, capture_output=True,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_requests(send, n: int) -> list[float]:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        send()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list[float]):
+    print(f"{label:<14} mean {statistics.mean(timings):7.2f} ms | "
+          f"p50 {statistics.median(timings):7.2f} ms | max {max(timings):7.2f} ms")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as cert_dir:
+        server = start_https_server(cert_dir)
+        url = f"https://localhost:{server.server_address[1]}/v1beta/models/gemini-2.5-flash"
+
+        def per_instance():
+            with httpx.Client(verify=False) as client:
+                client.get(url).raise_for_status()
+
+        shared_client, _ = build_http_clients(verify=False)
+        shared_client.get(url).raise_for_status()  # warm-up, as done at app startup
+
+        def shared():
+            shared_client.get(url).raise_for_status()
+
+        print(f"🔌 {n} requests against local HTTPS stand-in")
+        print("-" * 50)
+        per_instance_timings = time_requests(per_instance, n)
+        shared_timings = time_requests(shared, n)
+        report("Per-instance", per_instance_timings)
+        report("Shared", shared_timings)
+        saved = statistics.mean(per_instance_timings) - statistics.mean(shared_timings)
+        print(f"Handshake overhead removed: {saved:.2f} ms per request")
+
+        shared_client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure per-turn storage cost against session length for the legacy blob storage
+(SqliteStorage) and the append-only run storage (SqliteRunStorage).
+
+Each turn mirrors what an agent run does with its storage: read the session, append
+one run (BoQ-sized text, with an inline image every few turns) and write it back.
+
+Usage: python benchmarks/bench_session_storage.py [turns]
+"""
+import os
+import sys
+import time
+import uuid
+import base64
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agno.storage.session.agent import AgentSession
+from agno.storage.sqlite import SqliteStorage
+from utility.run_storage import SqliteRunStorage
+
+BOQ_ROW = "Ceramic floor tiling (600x600)       | 180      | square meters\n"
+IMAGE_CONTENT = base64.b64encode(os.urandom(200_000)).decode("utf-8")
+IMAGE_EVERY = 5
+HISTORY_RUNS = 5
+
+
+def make_run(session_id: str, turn: int) -> dict:
+    user_message = {"role": "user", "content": f"Revise floor {turn} of the BoQ", "created_at": int(time.time())}
+    if turn % IMAGE_EVERY == 0:
+        user_message["images"] = [{"content": IMAGE_CONTENT}]
+    return {
+        "run_id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "agent_id": "boq_agent",
+        "content": BOQ_ROW * 150,
+        "messages": [
+            user_message,
+            {"role": "assistant", "content": BOQ_ROW * 150, "created_at": int(time.time())},
+        ],
+    }
+
+
+def run_turn(storage, session_id: str, turn: int) -> float:
+    start = time.perf_counter()
+    session = storage.read(session_id=session_id)
+    memory = dict(session.memory) if session is not None and session.memory else {}
+    runs = list(memory.get("runs", []))
+    runs.append(make_run(session_id, turn))
+    memory["runs"] = runs
+    storage.upsert(AgentSession(session_id=session_id, agent_id="boq_agent", user_id="bench", memory=memory))
+    return (time.perf_counter() - start) * 1000
+
+
+def bench(storage, turns: int, checkpoints: list[int]) -> dict[int, float]:
+    session_id = str(uuid.uuid4())[:8]
+    timings = [run_turn(storage, session_id, turn) for turn in range(1, turns + 1)]
+    # Average over the few turns leading up to each checkpoint to smooth out noise
+    return {n: statistics.mean(timings[max(0, n - 5):n]) for n in checkpoints}
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    checkpoints = [n for n in (10, 25, 50, 100, 200, 400, 800) if n <= turns]
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        blob = SqliteStorage(table_name="blob_storage", db_file=os.path.join(db_dir, "blob.db"))
+        append_only = SqliteRunStorage(
+            table_name="run_storage", db_file=os.path.join(db_dir, "runs.db"), num_history_runs=HISTORY_RUNS
+        )
+
+        print(f"💾 Per-turn storage cost over {turns} turns (read + append + write)")
+        print("-" * 50)
+        blob_timings = bench(blob, turns, checkpoints)
+        append_timings = bench(append_only, turns, checkpoints)
+
+        print(f"{'Turn':>6} | {'Blob (ms)':>10} | {'Append-only (ms)':>16}")
+        for n in checkpoints:
+            print(f"{n:>6} | {blob_timings[n]:>10.2f} | {append_timings[n]:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
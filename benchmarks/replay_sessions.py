@@ -0,0 +1,328 @@
+"""
+Replay recorded agent sessions against the current code and flag performance regressions.
+
+Record traces by running the app with AGENT_TRACE_DIR set; every agent turn is appended to
+`<AGENT_TRACE_DIR>/<session_id>.jsonl`. This script replays each session offline with a fake
+model that answers from the recorded responses, on fresh temporary storage and memory DBs,
+and compares per turn:
+
+- estimated prompt tokens sent to the model
+- model calls made (agent, memory manager, session summary)
+- storage operations and bytes written
+- memory DB operations
+
+A turn regresses when tokens grow by more than --threshold or any call/operation count grows;
+the prompt sections (system instruction, tools, conversation) that grew are named. A turn that
+raises or belongs to an unknown agent fails. Each session replays in a fresh worker process.
+The exit code is 1 when any turn regressed or failed, so it can gate a deploy.
+
+Usage: python benchmarks/replay_sessions.py [trace_dir] [--threshold 0.1] [--workers 4] [--json report.json]
+"""
+import os
+import sys
+import json
+import asyncio
+import inspect
+import argparse
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 1x1 PNG standing in for uploads that are not part of the trace corpus
+PLACEHOLDER_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+COUNT_METRICS = ("model_calls", "storage_ops", "memory_ops")
+
+
+class ReplayScript:
+    """
+    Recorded model responses of the turn being replayed, queued per lane.
+    """
+
+    def __init__(self):
+        self.lanes: Dict[str, deque] = {}
+
+    def load_turn(self, turn: Dict[str, Any]) -> None:
+        self.lanes = {}
+        for event in turn["events"]:
+            if event["type"] == "model_call":
+                self.lanes.setdefault(event["lane"], deque()).append(event.get("chunks") or [])
+
+    def next_chunks(self, lane: str) -> List[Dict[str, Any]]:
+        queue = self.lanes.get(lane)
+        if queue:
+            return queue.popleft()
+        # More calls than were recorded: answer with an empty text response
+        return [{"candidates": [{"content": {"role": "model", "parts": [{"text": ""}]}}]}]
+
+
+def merge_chunks(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Collapse streamed chunks into one non-streamed response.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    merged = json.loads(json.dumps(chunks[-1]))
+    parts = []
+    for chunk in chunks:
+        for candidate in chunk.get("candidates", [])[:1]:
+            for part in (candidate.get("content") or {}).get("parts") or []:
+                if parts and "text" in part and set(parts[-1]) == {"text"} and set(part) == {"text"}:
+                    parts[-1] = {"text": parts[-1]["text"] + part["text"]}
+                else:
+                    parts.append(part)
+    if merged.get("candidates"):
+        merged["candidates"][0].setdefault("content", {"role": "model"})["parts"] = parts
+    return merged
+
+
+class FakeModels:
+    def __init__(self, script: ReplayScript, model):
+        self.script = script
+        self.model = model
+
+    def _chunks(self):
+        from google.genai import types
+        from utility.tracing import get_trace_recorder
+
+        _, lane = get_trace_recorder().turn_for(self.model)
+        return [types.GenerateContentResponse.model_validate(chunk) for chunk in self.script.next_chunks(lane or "agent")]
+
+    def generate_content(self, *, model, contents, config=None, **kwargs):
+        from google.genai import types
+        from utility.tracing import get_trace_recorder
+
+        _, lane = get_trace_recorder().turn_for(self.model)
+        return types.GenerateContentResponse.model_validate(merge_chunks(self.script.next_chunks(lane or "agent")))
+
+    def generate_content_stream(self, *, model, contents, config=None, **kwargs):
+        yield from self._chunks()
+
+
+class FakeAsyncModels(FakeModels):
+    async def generate_content(self, *, model, contents, config=None, **kwargs):
+        return super().generate_content(model=model, contents=contents, config=config, **kwargs)
+
+    async def generate_content_stream(self, *, model, contents, config=None, **kwargs):
+        async def stream():
+            for chunk in self._chunks():
+                yield chunk
+        return stream()
+
+
+class FakeClient:
+    def __init__(self, script: ReplayScript, model):
+        self.models = FakeModels(script, model)
+        self.aio = type("FakeAio", (), {"models": FakeAsyncModels(script, model)})()
+
+
+def replay_model_class():
+    from utility.gemini_client import SharedGemini
+
+    class ReplayGemini(SharedGemini):
+        """SharedGemini answering from a ReplayScript instead of the Gemini API."""
+
+        def base_client(self):
+            return FakeClient(self.script, self)
+
+        def __deepcopy__(self, memo):
+            # Memory managers get deep copies of the model; they must keep the same script
+            memo[id(self.script)] = self.script
+            return super().__deepcopy__(memo)
+
+    return ReplayGemini
+
+
+def install_replay_model(agent, script: ReplayScript) -> None:
+    ReplayGemini = replay_model_class()
+
+    def replay_model():
+        model = ReplayGemini(id=agent.model.id)
+        model.script = script
+        return model
+
+    agent.model = replay_model()
+    memory = agent.memory
+    if memory is not None:
+        memory.model = replay_model()
+        for manager in (getattr(memory, "memory_manager", None), getattr(memory, "summary_manager", None)):
+            if manager is not None:
+                manager.model = replay_model()
+
+
+def load_session(path: Path) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as trace_file:
+        return [json.loads(line) for line in trace_file if line.strip()]
+
+
+def consume(result) -> None:
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)
+    if hasattr(result, "__aiter__"):
+        async def drain():
+            async for _ in result:
+                pass
+        asyncio.run(drain())
+    elif hasattr(result, "__iter__") and not isinstance(result, (str, bytes, dict)):
+        for _ in result:
+            pass
+
+
+def replay_turn(agent, turn: Dict[str, Any], placeholder: str) -> None:
+    from agno.media import Image
+
+    entrypoint = turn.get("entrypoint")
+    if entrypoint:
+        args = dict(entrypoint["args"])
+        if args.get("file_path") and not os.path.exists(args["file_path"]):
+            args["file_path"] = placeholder
+        consume(getattr(agent, entrypoint["name"])(**args))
+    else:
+        images = [Image(filepath=path if os.path.exists(path) else placeholder) for path in turn.get("images") or []]
+        consume(agent.run(
+            turn.get("message"), user_id=turn.get("user_id"), session_id=turn.get("session_id"),
+            images=images or None, stream=False,
+        ))
+
+
+def replay_session(path: str) -> Dict[str, Any]:
+    """
+    Replay one recorded session on fresh DBs and return recorded vs replayed figures per turn.
+    """
+    turns = load_session(Path(path))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.environ["STORAGE_DB_FILE"] = os.path.join(work_dir, "storage.db")
+        os.environ["MEMORY_DB_FILE"] = os.path.join(work_dir, "memory.db")
+        os.environ.setdefault("GEMINI_MODEL", "gemini-2.5-flash")
+        placeholder = os.path.join(work_dir, "placeholder.png")
+        with open(placeholder, "wb") as placeholder_file:
+            placeholder_file.write(PLACEHOLDER_PNG)
+
+        from agno.utils.log import set_log_level_to_info
+        import utility.project_profile as project_profile
+        from utility.tracing import TraceRecorder, set_trace_recorder, summarize_turn
+        from agents.boq_agent import BOQAgent
+        from agents.interview_agent import InterviewAgent
+        from agents.visualizer_agent import VisualizerAgent
+
+        project_profile._project_profiles = None
+        script = ReplayScript()
+        agents = {}
+        for agent_class in (InterviewAgent, VisualizerAgent, BOQAgent):
+            agent = agent_class()
+            agent.debug_mode = False
+            install_replay_model(agent, script)
+            agents[agent.agent_id] = agent
+        set_log_level_to_info()
+
+        recorder = TraceRecorder()
+        set_trace_recorder(recorder)
+        results = []
+        try:
+            for index, turn in enumerate(turns):
+                agent = agents.get(turn["agent_id"])
+                if agent is None:
+                    results.append({"turn": index, "agent_id": turn["agent_id"], "error": "unknown agent"})
+                    continue
+                script.load_turn(turn)
+                replayed_before = len(recorder.turns)
+                error = None
+                try:
+                    replay_turn(agent, turn, placeholder)
+                except Exception as e:
+                    error = str(e)
+                replayed = recorder.turns[replayed_before:]
+                results.append({
+                    "turn": index,
+                    "agent_id": turn["agent_id"],
+                    "recorded": summarize_turn(turn),
+                    "replayed": summarize_turn({"events": [e for t in replayed for e in t["events"]]}),
+                    "error": error,
+                })
+        finally:
+            set_trace_recorder(None)
+
+    return {"session": Path(path).stem, "turns": results}
+
+
+def find_regressions(turn: Dict[str, Any], threshold: float) -> List[str]:
+    if "recorded" not in turn:
+        return []
+    recorded, replayed = turn["recorded"], turn["replayed"]
+    regressions = []
+    if replayed["tokens_sent"] > recorded["tokens_sent"] * (1 + threshold):
+        grown = [
+            f"{section} +{chars - recorded['prompt_chars'].get(section, 0)} chars"
+            for section, chars in replayed["prompt_chars"].items()
+            if chars > recorded["prompt_chars"].get(section, 0)
+        ]
+        detail = f" ({', '.join(grown)})" if grown else ""
+        regressions.append(f"tokens_sent {recorded['tokens_sent']} -> {replayed['tokens_sent']}{detail}")
+    for metric in COUNT_METRICS:
+        if replayed[metric] > recorded[metric]:
+            regressions.append(f"{metric} {recorded[metric]} -> {replayed[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace_dir", nargs="?", default=os.getenv("AGENT_TRACE_DIR", "traces"))
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative growth in tokens sent")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", dest="json_path", help="write the full report to this file")
+    args = parser.parse_args()
+
+    paths = sorted(str(path) for path in Path(args.trace_dir).glob("*.jsonl"))
+    if not paths:
+        print(f"No recorded sessions found in {args.trace_dir}")
+        return
+
+    print(f"🔁 Replaying {len(paths)} session(s) from {args.trace_dir}")
+    print("-" * 50)
+    # One process per session: replays set os.environ and module-level caches
+    with ProcessPoolExecutor(max_workers=args.workers, max_tasks_per_child=1) as pool:
+        reports = list(pool.map(replay_session, paths))
+
+    regressed_turns = 0
+    failed_turns = 0
+    totals = {"recorded": {}, "replayed": {}}
+    for report in reports:
+        for turn in report["turns"]:
+            if turn.get("error"):
+                failed_turns += 1
+                print(f"[ERROR] {report['session']} turn {turn['turn']} ({turn['agent_id']}): {turn['error']}")
+            for side in ("recorded", "replayed"):
+                for metric, value in (turn.get(side) or {}).items():
+                    if isinstance(value, int):
+                        totals[side][metric] = totals[side].get(metric, 0) + value
+            regressions = find_regressions(turn, args.threshold)
+            turn["regressions"] = regressions
+            if regressions:
+                regressed_turns += 1
+                print(f"⚠️  {report['session']} turn {turn['turn']} ({turn['agent_id']}): {'; '.join(regressions)}")
+
+    print("-" * 50)
+    print(f"{'Metric':<22} | {'Recorded':>10} | {'Replayed':>10}")
+    for metric in totals["recorded"]:
+        print(f"{metric:<22} | {totals['recorded'][metric]:>10} | {totals['replayed'].get(metric, 0):>10}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as report_file:
+            json.dump(reports, report_file, indent=2)
+
+    if regressed_turns or failed_turns:
+        print(f"❌ {regressed_turns} turn(s) regressed, {failed_turns} turn(s) failed to replay")
+        sys.exit(1)
+    print("✅ No performance regressions")
+
+
+if __name__ == "__main__":
+    main()
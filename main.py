@@ -4,15 +4,19 @@ from agno.app.fastapi.app import FastAPIApp
 from agents.visualizer_agent import VisualizerAgent
 from agents.interview_agent import InterviewAgent
 from agents.boq_agent import BOQAgent
+from utility.gemini_client import warm_up, awarm_up
+from utility.project_profile import shared_project_profiles
+from utility.responses import CompressionMiddleware, cached_json_response
+from utility.utils import shared_storage
+from utility.uploads import UploadStore, UploadQuotaExceeded, run_reaper
 from agno.team.team import Team
-from fastapi import File, UploadFile, Form, HTTPException, FastAPI
+from fastapi import File, UploadFile, Form, HTTPException, FastAPI, Request
 from fastapi.responses import JSONResponse
 from typing import List
 import os
 import base64
-from datetime import datetime
 import uuid
-import shutil
+import asyncio
 
 
 
@@ -38,6 +42,28 @@ fastapi_app = FastAPIApp(
 )
 
 app = fastapi_app.get_app()
+app.add_middleware(CompressionMiddleware)
+
+# Run storage backing the result retrieval endpoint
+run_storage = shared_storage()
+
+# Sharded upload storage with per-user quotas
+upload_store = UploadStore(db_file=os.getenv("STORAGE_DB_FILE"))
+
+# Open the shared Gemini connections before the first request arrives
+@app.on_event("startup")
+async def warm_up_model_client():
+    await asyncio.to_thread(warm_up)
+    await awarm_up()
+
+# Expire uploads that no live session references
+@app.on_event("startup")
+async def start_upload_reaper():
+    app.state.upload_reaper = asyncio.create_task(run_reaper(upload_store))
+
+@app.on_event("shutdown")
+async def stop_upload_reaper():
+    app.state.upload_reaper.cancel()
 
 # Custom endpoint to analyze uploaded images
 @app.post("/analyze-image")
@@ -48,31 +74,23 @@ async def analyze_image(
     session_id: str = Form("")
 ):
     """
-    Custom endpoint to receive image uploads, save them to user-specific folders,
+    Custom endpoint to receive image uploads, save them to the sharded upload store,
     and pass them to the visualizer agent for analysis.
     """
     try:
-        # Create user-specific upload directory
-        user_upload_dir = f"uploads/{user_id}"
-        os.makedirs(user_upload_dir, exist_ok=True)
-        
-        # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{timestamp}_{file.filename}"
-        file_path = os.path.join(user_upload_dir, unique_filename)
-        
-        # Save the uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # Save the uploaded file, enforcing the user's quota
+        try:
+            upload = await asyncio.to_thread(upload_store.save, file.file, file.filename, user_id, session_id)
+        except UploadQuotaExceeded as quota_error:
+            raise HTTPException(status_code=413, detail=str(quota_error))
+        file_path = upload.path
+        file_size = upload.size_bytes
         
         print(f"[DEBUG] File saved: {file_path} ({file_size} bytes)")
         
         # Pass the file to the visualizer agent
         analysis_result = ""
+        run_id = None
         try:
             # Use the visualizer agent's visualize method
             response_generator = VisualizerAgent.visualize(
@@ -84,6 +102,8 @@ async def analyze_image(
             
             # Collect the response from the generator
             for event in response_generator:
+                run_id = run_id or getattr(event, 'run_id', None)
+                session_id = session_id or getattr(event, 'session_id', None) or ""
                 if hasattr(event, 'content') and event.content:
                     analysis_result += event.content
                 elif hasattr(event, 'delta') and event.delta:
@@ -93,6 +113,10 @@ async def analyze_image(
             print(f"[ERROR] Agent analysis failed: {agent_error}")
             analysis_result = f"Analysis failed: {str(agent_error)}"
         
+        # Tie the upload to the session the agent ran in, so the reaper keeps it while the session is live
+        if session_id and upload.session_id != session_id:
+            upload_store.attach_session(upload.upload_id, session_id)
+        
         # Return response with file info and analysis
         return JSONResponse(content={
             "status": "success",
@@ -104,6 +128,8 @@ async def analyze_image(
                 "content_type": file.content_type
             },
             "analysis": analysis_result,
+            "run_id": run_id,
+            "result_url": f"/results/{run_id}" if run_id else None,
             "user_id": user_id,
             "session_id": session_id
         })
@@ -115,6 +141,43 @@ async def analyze_image(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+# Stored agent run results, revalidated with ETag / If-None-Match
+@app.get("/results/{run_id}")
+async def get_result(run_id: str, request: Request):
+    """
+    Return the stored output of a past agent run so clients can reload it without rerunning the agent.
+    """
+    run = run_storage.read_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"No result for run: {run_id}")
+    return cached_json_response(request, {
+        "run_id": run_id,
+        "agent_id": run.get("agent_id"),
+        "session_id": run.get("session_id"),
+        "status": run.get("status"),
+        "content": run.get("content"),
+        "created_at": run.get("created_at"),
+    })
+
+
+# Upload storage usage and reaper metrics
+@app.get("/metrics/uploads")
+async def upload_metrics():
+    return JSONResponse(content=await asyncio.to_thread(upload_store.metrics))
+
+
+# Live project profile gathered by the interview agent
+@app.get("/project-profile/{session_id}")
+async def get_project_profile(session_id: str):
+    """
+    Return the structured project profile for a session, as built up during the interview.
+    """
+    profile = shared_project_profiles().get(session_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No project profile for session: {session_id}")
+    return JSONResponse(content=profile.model_dump())
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,65 @@
+"""
+Compression and ETag behaviour of the real app stack (agno's BaseHTTPMiddleware re-streams every
+response, so a bare FastAPI app does not exercise the same framing).
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp()
+os.environ["STORAGE_DB_FILE"] = os.path.join(_tmp, "storage.db")
+os.environ["MEMORY_DB_FILE"] = os.path.join(_tmp, "memory.db")
+os.environ["UPLOAD_ROOT"] = os.path.join(_tmp, "uploads")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("GEMINI_MODEL", "gemini-2.5-flash")
+
+import pytest
+from agno.storage.session.agent import AgentSession
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture(scope="module")
+def client():
+    # Not used as a context manager: startup would warm up the Gemini client over the network
+    return TestClient(main.app)
+
+
+@pytest.fixture(scope="module")
+def run_id():
+    main.run_storage.upsert(AgentSession(
+        session_id="s-compression", agent_id="boq_agent", user_id="u",
+        memory={"runs": [{"run_id": "r-compression", "agent_id": "boq_agent", "content": "Concrete slab | 95 | m3\n" * 200}]},
+    ))
+    return "r-compression"
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "identity"])
+def test_small_json_is_not_compressed(client, encoding):
+    response = client.get("/metrics/uploads", headers={"Accept-Encoding": encoding})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-length"] == str(len(response.content))
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_large_json_is_compressed_with_length(client, run_id):
+    response = client.get(f"/results/{run_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    # TestClient decodes the body; the declared length is the compressed one
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()["run_id"] == run_id
+    assert response.headers["etag"].startswith('W/"')
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "identity"])
+def test_not_modified_keeps_validator_and_vary(client, run_id, encoding):
+    first = client.get(f"/results/{run_id}", headers={"Accept-Encoding": encoding})
+    second = client.get(
+        f"/results/{run_id}", headers={"Accept-Encoding": encoding, "If-None-Match": first.headers["etag"]}
+    )
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+    assert "Accept-Encoding" in second.headers["vary"]
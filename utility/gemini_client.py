@@ -0,0 +1,134 @@
+import os
+import asyncio
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+from google import genai
+from google.genai import types
+from agno.models.google import Gemini
+from utility.tracing import get_trace_recorder
+
+# Pool configuration, overridable through the environment
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "120"))
+GEMINI_HTTP2 = os.getenv("GEMINI_HTTP2", "true").lower() in ("1", "true", "yes")
+GEMINI_WARMUP_CONNECTIONS = int(os.getenv("GEMINI_WARMUP_CONNECTIONS", "1"))
+# Upper bound on each warm-up request, so an unreachable API cannot hold up startup
+GEMINI_WARMUP_TIMEOUT = float(os.getenv("GEMINI_WARMUP_TIMEOUT", "5"))
+
+_client: Optional[genai.Client] = None
+_client_lock = threading.Lock()
+
+
+def http2_available() -> bool:
+    """
+    HTTP/2 in httpx needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it.
+    """
+    return GEMINI_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY,
+    )
+
+
+def build_http_clients(**kwargs) -> tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Build the pooled sync/async httpx clients used for every Gemini request in the process.
+    Extra keyword arguments (e.g. `verify`) are forwarded to both clients.
+    """
+    client_args = {"http2": http2_available(), "limits": pool_limits(), "timeout": None, **kwargs}
+    return httpx.Client(**client_args), httpx.AsyncClient(**client_args)
+
+
+def shared_genai_client() -> genai.Client:
+    """
+    Returns the process-wide google-genai client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                sync_client, async_client = build_http_clients()
+                _client = genai.Client(
+                    http_options=types.HttpOptions(httpx_client=sync_client, httpx_async_client=async_client)
+                )
+    return _client
+
+
+class SharedGemini(Gemini):
+    """
+    Gemini model that always talks through the shared pooled client.
+
+    agno deep-copies models for memory managers and summarizers and drops `client` on copy,
+    so the shared client is resolved in `get_client` rather than passed in as a field.
+    While a trace recorder is active, calls go through a recording proxy.
+    """
+
+    def get_client(self) -> genai.Client:
+        if self.client is None:
+            self.client = self.base_client()
+        recorder = get_trace_recorder()
+        return recorder.wrap_client(self.client, self) if recorder is not None else self.client
+
+    def base_client(self) -> genai.Client:
+        return shared_genai_client()
+
+    def __deepcopy__(self, memo):
+        # Memory managers and summarizers call a fresh copy each time; remember the configured
+        # model it came from so traces can attribute the call
+        origin = getattr(self, "trace_origin", None)
+        if origin is not None:
+            memo[id(origin)] = origin
+        copied = super().__deepcopy__(memo)
+        copied.trace_origin = self
+        return copied
+
+
+def warm_up_config(timeout: float = GEMINI_WARMUP_TIMEOUT) -> types.GetModelConfig:
+    """
+    Per-request options bounding a warm-up call; the shared clients themselves have no timeout.
+    """
+    return types.GetModelConfig(http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+
+
+def warm_up(model_id: str = None, connections: int = GEMINI_WARMUP_CONNECTIONS) -> None:
+    """
+    Open `connections` keep-alive connections with a lightweight model lookup so the first
+    agent run does not pay for DNS, TCP and TLS setup. Each lookup is bounded by
+    GEMINI_WARMUP_TIMEOUT seconds.
+
+    With HTTP/2 every request is multiplexed over a single connection, so only one is opened
+    regardless of `connections`.
+    """
+    model_id = model_id or os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    client = shared_genai_client()
+    connections = 1 if http2_available() else max(connections, 1)
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            list(pool.map(lambda _: client.models.get(model=model_id, config=warm_up_config()), range(connections)))
+        print(f"[DEBUG] Gemini client warmed up ({connections} connection(s), http2={http2_available()})")
+    except Exception as e:
+        print(f"[WARNING] Gemini client warm-up failed: {e}")
+
+
+async def awarm_up(model_id: str = None) -> None:
+    """
+    Async counterpart of `warm_up`; must run on the server's event loop so the pooled
+    connection belongs to it.
+    """
+    model_id = model_id or os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+    try:
+        await asyncio.wait_for(
+            shared_genai_client().aio.models.get(model=model_id, config=warm_up_config()),
+            timeout=GEMINI_WARMUP_TIMEOUT,
+        )
+    except Exception as e:
+        print(f"[WARNING] Gemini async client warm-up failed: {e!r}")
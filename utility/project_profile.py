@@ -0,0 +1,257 @@
+import os
+import time
+import inspect
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from agno.agent import Agent
+from pydantic import BaseModel, Field
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import Column, MetaData, Table
+from sqlalchemy.sql.expression import select
+from sqlalchemy.types import Integer, String, Text
+
+PROJECT_PROFILE_CACHE_SIZE = int(os.getenv("PROJECT_PROFILE_CACHE_SIZE", "1024"))
+
+# (session_id, user_id) of the agent run executing in the current context. Agent attributes are
+# shared by every concurrent run of the same agent instance, so they cannot identify the session.
+_run_session: ContextVar[Optional[Tuple[str, Optional[str]]]] = ContextVar("project_run_session", default=None)
+
+
+class ProjectProfile(BaseModel):
+    """
+    Structured project brief built up during the interview, one per session.
+    """
+    session_id: str
+    user_id: Optional[str] = None
+
+    # Part A: Purpose & People
+    building_type: Optional[str] = None
+    purpose: Optional[str] = None
+    primary_users: Optional[str] = None
+    peak_occupancy: Optional[str] = None
+
+    # Part B: Spaces & Flow
+    floors: Optional[str] = None
+    essential_zones: Optional[str] = None
+    support_areas: Optional[str] = None
+    circulation: Optional[str] = None
+
+    # Part C: Site & Structure
+    location: Optional[str] = None
+    site_context: Optional[str] = None
+    existing_structures: Optional[str] = None
+    restrictions: Optional[str] = None
+
+    # Part D: Style & Practicalities
+    desired_style: Optional[str] = None
+    desired_atmosphere: Optional[str] = None
+    materials: Optional[str] = None
+    special_features: Optional[str] = None
+    budget_range: Optional[str] = None
+    timeline: Optional[str] = None
+
+    # Facts that don't map onto a known key
+    other: Dict[str, str] = Field(default_factory=dict)
+    updated_at: Optional[int] = None
+
+    def set_fact(self, key: str, value: str) -> None:
+        key = key.strip().lower().replace(" ", "_")
+        if key in ProjectProfile.model_fields and key not in ("session_id", "user_id", "other", "updated_at"):
+            setattr(self, key, value)
+        else:
+            self.other[key] = value
+        self.updated_at = int(time.time())
+
+    def facts(self) -> Dict[str, str]:
+        facts = self.model_dump(exclude={"session_id", "user_id", "other", "updated_at"}, exclude_none=True)
+        facts.update(self.other)
+        return facts
+
+    def to_brief(self) -> str:
+        """
+        Render the profile as a plain-text design brief for prompts.
+        """
+        return "\n".join(f"- {key.replace('_', ' ').title()}: {value}" for key, value in self.facts().items())
+
+
+class ProjectProfileCache:
+    """
+    In-process LRU cache of project profiles, written through to a sqlite table.
+    """
+
+    def __init__(self, table_name: str = "project_profiles", db_file: Optional[str] = None, max_size: int = PROJECT_PROFILE_CACHE_SIZE):
+        if db_file is not None:
+            db_path = Path(db_file).resolve()
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.db_engine = create_engine(f"sqlite:///{db_path}")
+        else:
+            # One shared connection, or every thread would see its own empty in-memory database
+            self.db_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        self.table = Table(
+            table_name,
+            MetaData(),
+            Column("session_id", String, primary_key=True),
+            Column("user_id", String, index=True),
+            Column("profile", Text),
+            Column("updated_at", Integer),
+        )
+        self.table.create(self.db_engine, checkfirst=True)
+
+        self.max_size = max_size
+        self._profiles: "OrderedDict[str, ProjectProfile]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, session_id: str) -> Optional[ProjectProfile]:
+        with self._lock:
+            profile = self._profiles.get(session_id)
+            if profile is not None:
+                self._profiles.move_to_end(session_id)
+                return profile.model_copy(deep=True)
+
+        with self.db_engine.connect() as conn:
+            row = conn.execute(select(self.table.c.profile).where(self.table.c.session_id == session_id)).fetchone()
+        if row is None:
+            return None
+
+        profile = ProjectProfile.model_validate_json(row.profile)
+        with self._lock:
+            self._remember(profile)
+        return profile.model_copy(deep=True)
+
+    def update(self, session_id: str, key: str, value: str, user_id: Optional[str] = None) -> ProjectProfile:
+        """
+        Set one fact on the session's profile and write the profile through to storage.
+        """
+        with self._lock:
+            profile = self.get(session_id) or ProjectProfile(session_id=session_id, user_id=user_id)
+            if user_id is not None:
+                profile.user_id = user_id
+            profile.set_fact(key, value)
+
+            profile_json = profile.model_dump_json()
+            stmt = sqlite.insert(self.table).values(
+                session_id=session_id, user_id=profile.user_id, profile=profile_json, updated_at=profile.updated_at
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["session_id"],
+                set_=dict(user_id=profile.user_id, profile=profile_json, updated_at=profile.updated_at),
+            )
+            with self.db_engine.begin() as conn:
+                conn.execute(stmt)
+
+            self._remember(profile)
+        return profile.model_copy(deep=True)
+
+    def _remember(self, profile: ProjectProfile) -> None:
+        self._profiles[profile.session_id] = profile
+        self._profiles.move_to_end(profile.session_id)
+        while len(self._profiles) > self.max_size:
+            self._profiles.popitem(last=False)
+
+
+_project_profiles: Optional[ProjectProfileCache] = None
+_project_profiles_lock = threading.Lock()
+
+
+def shared_project_profiles() -> ProjectProfileCache:
+    global _project_profiles
+    if _project_profiles is None:
+        with _project_profiles_lock:
+            if _project_profiles is None:
+                _project_profiles = ProjectProfileCache(db_file=os.getenv("STORAGE_DB_FILE"))
+    return _project_profiles
+
+
+def run_session(agent: Agent) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Session and user of the run executing in the current context, falling back to the agent's
+    attributes for runs started without an explicit session.
+    """
+    session = _run_session.get()
+    if session is not None:
+        return session
+    return agent.session_id, agent.user_id
+
+
+class ProjectSessionMixin:
+    """
+    Agent mixin that binds the session of each run to the context for the duration of the run
+    and of each streamed step, where tools and instruction callables read it through `run_session`.
+    """
+
+    def run(self, message=None, **kwargs):
+        session = (kwargs["session_id"], kwargs.get("user_id")) if kwargs.get("session_id") else None
+        token = _run_session.set(session)
+        try:
+            result = super().run(message, **kwargs)
+        finally:
+            _run_session.reset(token)
+        if inspect.isgenerator(result):
+            return self._stream_in_session(session, result)
+        return result
+
+    async def arun(self, message=None, **kwargs):
+        session = (kwargs["session_id"], kwargs.get("user_id")) if kwargs.get("session_id") else None
+        token = _run_session.set(session)
+        try:
+            result = await super().arun(message, **kwargs)
+        finally:
+            _run_session.reset(token)
+        if inspect.isasyncgen(result):
+            return self._astream_in_session(session, result)
+        return result
+
+    @staticmethod
+    def _stream_in_session(session, stream):
+        try:
+            while True:
+                token = _run_session.set(session)
+                try:
+                    event = next(stream)
+                except StopIteration:
+                    return
+                finally:
+                    _run_session.reset(token)
+                yield event
+        finally:
+            stream.close()
+
+    @staticmethod
+    async def _astream_in_session(session, stream):
+        try:
+            while True:
+                token = _run_session.set(session)
+                try:
+                    event = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _run_session.reset(token)
+                yield event
+        finally:
+            await stream.aclose()
+
+
+def save_project_fact(agent: Agent, key: str, value: str) -> str:
+    """
+    Save one concrete fact about the user's project to the project profile.
+
+    Args:
+        key: Short snake_case key, e.g. 'building_type', 'primary_users', 'desired_style', 'budget_range'.
+        value: The fact as stated by the user, e.g. 'home', 'family of 4'.
+
+    Returns:
+        str: Confirmation of the saved fact.
+    """
+    session_id, user_id = run_session(agent)
+    if not session_id:
+        return "No active session, fact not saved."
+    shared_project_profiles().update(session_id, key, value, user_id=user_id)
+    return f"Saved {key}: {value}"
+
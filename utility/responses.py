@@ -0,0 +1,207 @@
+import json
+import zlib
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick `br` or `gzip` from an Accept-Encoding header by q-value, preferring brotli on ties.
+    Returns None when the client accepts neither.
+    """
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[parts[0].lower()] = q
+
+    if "*" in weights:
+        for encoding in supported:
+            weights.setdefault(encoding, weights["*"])
+    candidates = [(weights[encoding], -index, encoding) for index, encoding in enumerate(supported) if weights.get(encoding, 0) > 0]
+    return max(candidates)[2] if candidates else None
+
+
+class _Encoder:
+    """
+    Incremental gzip/brotli encoder. `compress` sync-flushes so every chunk can be decoded
+    as soon as it arrives, which keeps streamed tokens from being held back in the buffer.
+    """
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing text responses with gzip or brotli.
+
+    Bodies are buffered before choosing: a body with a Content-Length is buffered whole (it is
+    complete upstream, but may arrive re-chunked by other middleware), any other body up to
+    `minimum_size`. Bodies smaller than `minimum_size` are sent as-is, complete bodies are compressed
+    with a Content-Length, and streams (agent runs; server-sent events without buffering) are
+    compressed chunk by chunk with a flush after every chunk.
+    Every negotiable response, compressed or not, carries the same weak ETag and `Vary`.
+    """
+
+    def __init__(self, app, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+        buffer = b""
+        buffer_limit = self.minimum_size
+        declared_length: Optional[int] = None
+        finished = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough, buffer, buffer_limit, declared_length, finished
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                compressible = "content-encoding" not in headers and content_type.startswith(COMPRESSIBLE_TYPES)
+                if compressible or message["status"] == 304:
+                    self.mark_negotiable(MutableHeaders(raw=message["headers"]))
+                passthrough = encoding is None or message["status"] in (204, 304) or not compressible
+                if passthrough:
+                    await send(message)
+                    return
+                start_message = message
+                if headers.get("content-length", "").isdigit():
+                    declared_length = buffer_limit = int(headers["content-length"])
+                elif content_type.startswith("text/event-stream"):
+                    # Events must reach the client as they are produced
+                    buffer_limit = 0
+                return
+
+            if message["type"] == "http.response.body" and finished:
+                # Trailing empty message after a body that was complete at its Content-Length
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                buffer += body
+                if more_body and len(buffer) < buffer_limit:
+                    return
+                if declared_length is not None and len(buffer) >= declared_length:
+                    more_body = False
+                    finished = message.get("more_body", False)
+
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(buffer) < self.minimum_size:
+                    # Small complete body: not worth compressing
+                    headers["Content-Length"] = str(len(buffer))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": buffer})
+                    start_message = None
+                    passthrough = True
+                    return
+
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["Content-Length"]
+                    await send(start_message)
+                    start_message = None
+                    body, buffer = buffer, b""
+                else:
+                    compressed = encoder.compress(buffer) + encoder.finish()
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start_message)
+                    start_message = None
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+            if more_body:
+                chunk = encoder.compress(body) if body else b""
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.compress(body) + encoder.finish()})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def mark_negotiable(headers: MutableHeaders) -> None:
+        """
+        Headers shared by every variant of a negotiable response (compressed, identity or 304):
+        `Vary: Accept-Encoding`, and a weak ETag since the encoded bodies differ byte-wise.
+        """
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            headers["ETag"] = f"W/{headers['etag']}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag, as used for GET revalidation.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+
+def cached_json_response(request: Request, content: Any, cache_control: str = "private, no-cache") -> Response:
+    """
+    JSON response with a content-hash ETag; returns 304 when the client already has it.
+    """
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
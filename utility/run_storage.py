@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from agno.storage.session import Session
+from agno.storage.sqlite import SqliteStorage
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import Column, MetaData, Table, UniqueConstraint
+from sqlalchemy.sql.expression import select
+from sqlalchemy.types import Integer, String, Text
+from sqlalchemy.inspection import inspect
+from utility.tracing import record_event
+
+# Keys under which agno serializes media lists (images, videos, audio)
+MEDIA_KEYS = ("images", "videos", "audio")
+# Inline media smaller than this stays in the run row
+MEDIA_INLINE_LIMIT = 1024
+# Sessions whose run hashes, and media ids known to be stored, are kept in memory. A miss only
+# costs an idempotent rewrite, so both are bounded LRUs.
+RUN_HASH_CACHE_SESSIONS = int(os.getenv("RUN_HASH_CACHE_SESSIONS", "1024"))
+MEDIA_CACHE_SIZE = int(os.getenv("MEDIA_CACHE_SIZE", "4096"))
+
+
+class SqliteRunStorage(SqliteStorage):
+    """
+    SqliteStorage that keeps each run in its own row instead of inside the session blob.
+
+    - `upsert` only writes runs that are new or changed since they were last read/written.
+    - `read` only loads the last `num_history_runs` runs of a session (None loads all).
+    - Inline media bytes are moved to a content-addressed media table and replaced by a
+      `media_ref`, then restored for the runs that are actually loaded.
+
+    Legacy rows that still carry `memory["runs"]` are read as before and migrated to the
+    runs table on their next write.
+    """
+
+    def __init__(self, table_name: str, num_history_runs: Optional[int] = 5, **kwargs):
+        super().__init__(table_name=table_name, **kwargs)
+        self.num_history_runs = num_history_runs
+        self.runs_table, self.media_table = self.get_run_tables(self.metadata)
+        self.metadata.create_all(self.db_engine, tables=[self.runs_table, self.media_table], checkfirst=True)
+        # session_id -> {run_id: hash of the stored run}, to skip rewriting unchanged runs
+        self._run_hashes: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._known_media: "OrderedDict[str, None]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def get_run_tables(self, metadata: MetaData) -> Tuple[Table, Table]:
+        runs_table = Table(
+            f"{self.table_name}_runs",
+            metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("session_id", String, index=True, nullable=False),
+            Column("run_id", String, index=True, nullable=False),
+            Column("agent_id", String, nullable=True),
+            Column("run", Text),
+            Column("created_at", Integer, default=lambda: int(time.time())),
+            Column("updated_at", Integer, onupdate=lambda: int(time.time())),
+            UniqueConstraint("session_id", "run_id"),
+            extend_existing=True,
+        )
+        media_table = Table(
+            f"{self.table_name}_media",
+            metadata,
+            Column("media_id", String, primary_key=True),
+            Column("content", Text),
+            Column("created_at", Integer, default=lambda: int(time.time())),
+            extend_existing=True,
+        )
+        return runs_table, media_table
+
+    @property
+    def stores_runs(self) -> bool:
+        return self.mode in ("agent", "team")
+
+    def read(self, session_id: str, user_id: Optional[str] = None) -> Optional[Session]:
+        started = time.time()
+        session = super().read(session_id=session_id, user_id=user_id)
+        if session is None or not self.stores_runs:
+            record_event(self, "storage", op="read", runs=0, duration_ms=round((time.time() - started) * 1000, 2))
+            return session
+
+        memory = dict(session.memory or {})
+        legacy_runs = memory.pop("runs", None)
+        runs = self.read_runs(session_id, limit=self.num_history_runs)
+        if not runs and legacy_runs:
+            # Move the full legacy history into the runs table before windowing it
+            with self.SqlSession() as sess, sess.begin():
+                self._write_runs(sess, session_id, legacy_runs)
+            runs = self.read_runs(session_id, limit=self.num_history_runs)
+        memory["runs"] = runs
+        session.memory = memory
+        if session.session_data:
+            session.session_data = self._load_media(session.session_data)
+        record_event(self, "storage", op="read", runs=len(runs), duration_ms=round((time.time() - started) * 1000, 2))
+        return session
+
+    def read_runs(
+        self, session_id: str, limit: Optional[int] = None, offset: int = 0, with_media: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns runs of a session in chronological order, newest `limit` runs first skipping `offset`.
+        Without `with_media`, media stays as `media_ref` entries instead of being loaded.
+        """
+        stmt = (
+            select(self.runs_table.c.session_id, self.runs_table.c.run_id, self.runs_table.c.run)
+            .where(self.runs_table.c.session_id == session_id)
+            .order_by(self.runs_table.c.id.desc())
+            .offset(offset)
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        with self.SqlSession() as sess:
+            rows = sess.execute(stmt).fetchall()
+
+        runs = []
+        hashes = {}
+        for row in reversed(rows):
+            hashes[row.run_id] = self._hash(row.run)
+            runs.append(json.loads(row.run))
+        self._remember_runs(session_id, hashes)
+        return self._load_media(runs) if with_media else runs
+
+    def read_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a single stored run by its run_id, without restoring media content.
+        """
+        with self.SqlSession() as sess:
+            row = sess.execute(
+                select(self.runs_table.c.run, self.runs_table.c.created_at).where(self.runs_table.c.run_id == run_id)
+            ).fetchone()
+        if row is None:
+            return None
+        run = json.loads(row.run)
+        run.setdefault("created_at", row.created_at)
+        return run
+
+    def upsert(self, session: Session, create_and_retry: bool = True) -> Optional[Session]:
+        if not self.stores_runs:
+            return super().upsert(session, create_and_retry=create_and_retry)
+
+        started = time.time()
+        memory = dict(getattr(session, "memory", None) or {})
+        runs = memory.pop("runs", None) or []
+        with self.SqlSession() as sess, sess.begin():
+            runs_written, bytes_written = self._write_runs(sess, session.session_id, runs)
+            session_data = self._store_media(sess, session.session_data) if session.session_data else None
+
+        stripped = replace(session, memory=memory or None, session_data=session_data)
+        result = super().upsert(stripped, create_and_retry=create_and_retry)
+        record_event(
+            self, "storage", op="upsert", runs=runs_written, bytes_written=bytes_written,
+            duration_ms=round((time.time() - started) * 1000, 2),
+        )
+        return result
+
+    def _write_runs(self, sess, session_id: str, runs: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Writes new or changed runs; returns the number of runs and bytes written.
+        """
+        runs_written = 0
+        bytes_written = 0
+        with self._cache_lock:
+            stored = dict(self._run_hashes.get(session_id) or {})
+        hashes = {}
+        for run in runs:
+            run_id = run.get("run_id")
+            if run_id is None:
+                continue
+            run_json = json.dumps(self._store_media(sess, run), sort_keys=True, default=str)
+            run_hash = self._hash(run_json)
+            hashes[run_id] = run_hash
+            if stored.get(run_id) == run_hash:
+                continue
+
+            stmt = sqlite.insert(self.runs_table).values(
+                session_id=session_id, run_id=run_id, agent_id=run.get("agent_id"), run=run_json
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["session_id", "run_id"],
+                set_=dict(run=run_json, updated_at=int(time.time())),
+            )
+            sess.execute(stmt)
+            runs_written += 1
+            bytes_written += len(run_json)
+        # Only the runs the caller still holds can be written again, so forget older ones
+        self._remember_runs(session_id, hashes, replace=True)
+        return runs_written, bytes_written
+
+    def _remember_runs(self, session_id: str, hashes: Dict[str, str], replace: bool = False) -> None:
+        with self._cache_lock:
+            if replace or session_id not in self._run_hashes:
+                self._run_hashes[session_id] = hashes
+            else:
+                self._run_hashes[session_id].update(hashes)
+            self._run_hashes.move_to_end(session_id)
+            while len(self._run_hashes) > RUN_HASH_CACHE_SESSIONS:
+                self._run_hashes.popitem(last=False)
+
+    def _remember_media(self, media_ids) -> None:
+        with self._cache_lock:
+            for media_id in media_ids:
+                self._known_media[media_id] = None
+                self._known_media.move_to_end(media_id)
+            while len(self._known_media) > MEDIA_CACHE_SIZE:
+                self._known_media.popitem(last=False)
+
+    def _store_media(self, sess, data: Any) -> Any:
+        """
+        Returns a copy of `data` with large inline media content replaced by `media_ref` entries.
+        """
+        if isinstance(data, list):
+            return [self._store_media(sess, item) for item in data]
+        if not isinstance(data, dict):
+            return data
+
+        result = {}
+        for key, value in data.items():
+            if key in MEDIA_KEYS and isinstance(value, list):
+                result[key] = [self._store_media_item(sess, item) for item in value]
+            elif isinstance(value, (dict, list)):
+                result[key] = self._store_media(sess, value)
+            else:
+                result[key] = value
+        return result
+
+    def _store_media_item(self, sess, item: Any) -> Any:
+        content = item.get("content") if isinstance(item, dict) else None
+        if not isinstance(content, str) or len(content) < MEDIA_INLINE_LIMIT:
+            return item
+
+        media_id = self._hash(content)
+        if media_id not in self._known_media:
+            stmt = sqlite.insert(self.media_table).values(media_id=media_id, content=content)
+            sess.execute(stmt.on_conflict_do_nothing(index_elements=["media_id"]))
+        self._remember_media([media_id])
+        item = {k: v for k, v in item.items() if k != "content"}
+        item["media_ref"] = media_id
+        return item
+
+    def _load_media(self, data: Any) -> Any:
+        refs: Set[str] = set()
+        self._collect_media_refs(data, refs)
+        if not refs:
+            return data
+
+        with self.SqlSession() as sess:
+            rows = sess.execute(
+                select(self.media_table.c.media_id, self.media_table.c.content).where(
+                    self.media_table.c.media_id.in_(refs)
+                )
+            ).fetchall()
+        contents = {row.media_id: row.content for row in rows}
+        self._remember_media(contents)
+        self._resolve_media_refs(data, contents)
+        return data
+
+    def _collect_media_refs(self, data: Any, refs: Set[str]) -> None:
+        if isinstance(data, list):
+            for item in data:
+                self._collect_media_refs(item, refs)
+        elif isinstance(data, dict):
+            if "media_ref" in data:
+                refs.add(data["media_ref"])
+            for value in data.values():
+                if isinstance(value, (dict, list)):
+                    self._collect_media_refs(value, refs)
+
+    def _resolve_media_refs(self, data: Any, contents: Dict[str, str]) -> None:
+        if isinstance(data, list):
+            for item in data:
+                self._resolve_media_refs(item, contents)
+        elif isinstance(data, dict):
+            media_id = data.pop("media_ref", None)
+            if media_id is not None and media_id in contents:
+                data["content"] = contents[media_id]
+            for value in data.values():
+                if isinstance(value, (dict, list)):
+                    self._resolve_media_refs(value, contents)
+
+    @staticmethod
+    def _hash(value: str) -> str:
+        return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+    def delete_session(self, session_id: Optional[str] = None):
+        super().delete_session(session_id=session_id)
+        if session_id is None:
+            return
+        with self.SqlSession() as sess, sess.begin():
+            sess.execute(self.runs_table.delete().where(self.runs_table.c.session_id == session_id))
+        with self._cache_lock:
+            self._run_hashes.pop(session_id, None)
+
+    def drop(self) -> None:
+        super().drop()
+        self.runs_table.drop(self.db_engine, checkfirst=True)
+        self.media_table.drop(self.db_engine, checkfirst=True)
+        self.runs_table, self.media_table = self.get_run_tables(self.metadata)
+        with self._cache_lock:
+            self._run_hashes.clear()
+            self._known_media.clear()
+
+    def __deepcopy__(self, memo):
+        from copy import deepcopy
+
+        cls = self.__class__
+        copied_obj = cls.__new__(cls)
+        memo[id(self)] = copied_obj
+
+        for k, v in self.__dict__.items():
+            if k in {"metadata", "table", "inspector", "runs_table", "media_table"}:
+                continue
+            elif k in {"db_engine", "SqlSession", "_cache_lock"}:
+                setattr(copied_obj, k, v)
+            else:
+                setattr(copied_obj, k, deepcopy(v, memo))
+
+        copied_obj.metadata = MetaData()
+        copied_obj.inspector = inspect(copied_obj.db_engine)
+        copied_obj.table = copied_obj.get_table()
+        copied_obj.runs_table, copied_obj.media_table = copied_obj.get_run_tables(copied_obj.metadata)
+        return copied_obj
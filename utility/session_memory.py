@@ -0,0 +1,136 @@
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from agno.memory.v2 import Memory
+from agno.memory.v2.schema import SessionSummary
+from agno.memory.v2.summarizer import SessionSummarizer, SessionSummaryResponse
+from agno.models.message import Message
+from utility.run_storage import SqliteRunStorage
+from utility.tracing import TracedMemory
+
+# Roles agno treats as the assistant side of a chat
+ASSISTANT_ROLES = ("assistant", "model", "CHATBOT")
+
+
+class RollingSessionSummarizer(SessionSummarizer):
+    """
+    SessionSummarizer that folds the previous summary into the new one.
+
+    Sessions are loaded with only the last `num_history_runs` runs, so the conversation handed to
+    the summarizer is a window. A leading system message carries the previous summary, which keeps
+    facts from runs outside the window in the session summary.
+    """
+
+    def get_system_message(self, conversation: List[Message], response_format: Any) -> Message:
+        previous = conversation[0].content if conversation and conversation[0].role == "system" else None
+        if previous is None:
+            return super().get_system_message(conversation, response_format=response_format)
+
+        message = super().get_system_message(conversation[1:], response_format=response_format)
+        message.content = message.content.replace(
+            "<conversation>",
+            "The session started before the conversation below. Update this summary of the earlier part of the "
+            "session with it, keeping every fact that is still true:\n"
+            f"<previous_summary>\n{previous}\n</previous_summary>\n\n<conversation>",
+            1,
+        )
+        return message
+
+
+class RollingSummaryMemory(Memory):
+    """
+    Memory whose session summaries are updated from the previous summary plus the loaded runs,
+    instead of being rebuilt from the loaded runs alone.
+    """
+
+    def summary_conversation(self, session_id: str, user_id: str) -> List[Message]:
+        conversation = self.get_messages_for_session(session_id=session_id)
+        previous = (self.summaries or {}).get(user_id, {}).get(session_id)
+        if previous is not None and previous.summary and conversation:
+            conversation = [Message(role="system", content=previous.summary)] + conversation
+        return conversation
+
+    def save_summary(self, session_id: str, user_id: str, response: Optional[SessionSummaryResponse]) -> Optional[SessionSummary]:
+        if response is None:
+            return None
+        session_summary = SessionSummary(summary=response.summary, topics=response.topics, last_updated=datetime.now())
+        self.summaries.setdefault(user_id, {})[session_id] = session_summary  # type: ignore
+        return session_summary
+
+    def create_session_summary(self, session_id: str, user_id: Optional[str] = None) -> Optional[SessionSummary]:
+        if not self.summary_manager:
+            raise ValueError("Summarizer not initialized")
+        self.set_log_level()
+        user_id = user_id or "default"
+        response = self.summary_manager.run(conversation=self.summary_conversation(session_id, user_id))
+        return self.save_summary(session_id, user_id, response)
+
+    async def acreate_session_summary(self, session_id: str, user_id: Optional[str] = None) -> Optional[SessionSummary]:
+        if not self.summary_manager:
+            raise ValueError("Summarizer not initialized")
+        self.set_log_level()
+        user_id = user_id or "default"
+        response = await self.summary_manager.arun(conversation=self.summary_conversation(session_id, user_id))
+        return self.save_summary(session_id, user_id, response)
+
+
+class SharedMemory(TracedMemory, RollingSummaryMemory):
+    """
+    Memory used by all agents: rolling session summaries, with thread-pool work traced.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("summarizer", RollingSessionSummarizer())
+        super().__init__(**kwargs)
+
+
+def chat_pair(run: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The user message and final assistant reply of a stored run, skipping replayed history.
+    """
+    messages = [message for message in run.get("messages") or [] if not message.get("from_history")]
+    user = next((message for message in messages if message.get("role") == "user"), None)
+    assistant = next((message for message in reversed(messages) if message.get("role") in ASSISTANT_ROLES), None)
+    if user is None or assistant is None:
+        return []
+    return [
+        {key: message.get(key) for key in ("role", "content", "created_at") if message.get(key) is not None}
+        for message in (user, assistant)
+    ]
+
+
+class StoredChatHistoryMixin:
+    """
+    Agent mixin whose `get_chat_history` tool pages runs from the run storage, so it reaches
+    beyond the `num_history_runs` window loaded into memory.
+    """
+
+    def get_chat_history_function(self, session_id: str) -> Callable:
+        storage = self.storage
+        if not isinstance(storage, SqliteRunStorage):
+            return super().get_chat_history_function(session_id=session_id)
+
+        def get_chat_history(num_chats: Optional[int] = None) -> str:
+            """Use this function to get the chat history between the user and agent.
+
+            Args:
+                num_chats: The number of chats to return.
+                    Each chat contains 2 messages. One from the user and one from the agent.
+                    Default: None
+
+            Returns:
+                str: A JSON of a list of dictionaries representing the chat history.
+
+            Example:
+                - To get the last chat, use num_chats=1.
+                - To get the last 5 chats, use num_chats=5.
+                - To get all chats, use num_chats=None.
+                - To get the first chat, use num_chats=None and pick the first message.
+            """
+            history: List[Dict[str, Any]] = []
+            for run in storage.read_runs(session_id, limit=num_chats, with_media=False):
+                history.extend(chat_pair(run))
+            return json.dumps(history, default=str) if history else ""
+
+        return get_chat_history
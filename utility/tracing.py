@@ -0,0 +1,537 @@
+import os
+import re
+import json
+import time
+import hashlib
+import inspect
+import threading
+import functools
+import contextvars
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.memory.v2 import Memory
+from agno.memory.v2.db.sqlite import SqliteMemoryDb
+
+# Estimated prompt tokens per image part (Gemini bills a fixed 258 tokens per image)
+IMAGE_TOKENS = 258
+
+# Entry point (e.g. `interview`) and arguments of the agent call currently being made
+_entrypoint: ContextVar[Optional[Dict[str, Any]]] = ContextVar("trace_entrypoint", default=None)
+# Turn of the agent run executing in the current context
+_current_turn: ContextVar[Optional["TurnTrace"]] = ContextVar("trace_turn", default=None)
+
+SAFE_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def _dump(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json", exclude_none=True)
+    return obj
+
+
+def _redact_media(data: Any) -> Any:
+    """
+    Replace inline media bytes in a dumped request with their size and hash.
+    """
+    if isinstance(data, list):
+        return [_redact_media(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if "inline_data" in data and isinstance(data["inline_data"], dict):
+        blob = data["inline_data"].get("data") or ""
+        return {**data, "inline_data": {
+            "mime_type": data["inline_data"].get("mime_type"),
+            "size": len(blob),
+            "sha256": hashlib.sha256(str(blob).encode("utf-8")).hexdigest(),
+        }}
+    return {key: _redact_media(value) for key, value in data.items()}
+
+
+def request_sections(contents: Any, config: Any) -> Dict[str, Any]:
+    """
+    Split a generate_content request into the prompt sections sent to the model (system instruction,
+    tool declarations, conversation), with inline media replaced by size and hash.
+    """
+    config = _dump(config) or {}
+    contents = [_dump(content) for content in (contents if isinstance(contents, list) else [contents])]
+    return {
+        "system_instruction": config.get("system_instruction"),
+        "tools": config.get("tools"),
+        "contents": _redact_media(contents),
+    }
+
+
+def section_sizes(sections: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Characters per prompt section of `request_sections` output, plus the number of images.
+    """
+    system_instruction = sections.get("system_instruction")
+    chars = 0
+    images = 0
+    for content in sections["contents"]:
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in (content or {}).get("parts") or []:
+            if part.get("text"):
+                chars += len(part["text"])
+            elif part.get("inline_data") or part.get("file_data"):
+                images += 1
+            else:
+                chars += len(json.dumps(part))
+    return {
+        "system_instruction": len(system_instruction if isinstance(system_instruction, str) else json.dumps(system_instruction))
+        if system_instruction else 0,
+        "tools": len(json.dumps(sections["tools"])) if sections.get("tools") else 0,
+        "contents": chars,
+        "images": images,
+    }
+
+
+def estimate_tokens(prompt_chars: Dict[str, int], images: int) -> int:
+    """
+    Rough prompt size in tokens: 4 characters per token for text, tool declarations and
+    function calls, plus a fixed cost per image.
+    """
+    return sum(prompt_chars.values()) // 4 + images * IMAGE_TOKENS
+
+
+class TurnTrace:
+    """
+    Everything one agent run did: model calls, storage and memory operations, with timings.
+    """
+
+    def __init__(self, agent, message: Any, run_kwargs: Dict[str, Any]):
+        self.agent = agent
+        self.agent_id = agent.agent_id
+        self.session_id = run_kwargs.get("session_id")
+        self.user_id = run_kwargs.get("user_id")
+        self.run_id: Optional[str] = None
+        self.entrypoint = _entrypoint.get()
+        self.message = message if isinstance(message, str) else None
+        images = run_kwargs.get("images") or []
+        self.images = [str(image.filepath) for image in images if getattr(image, "filepath", None)]
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def lane_of(self, obj: Any) -> Optional[str]:
+        """
+        Which part of the agent `obj` belongs to: its model, memory models, storage or memory db.
+        Per-call model copies are matched through the `trace_origin` chain they were copied from.
+        """
+        while obj is not None:
+            lane = self._lane_of(obj)
+            if lane is not None:
+                return lane
+            obj = getattr(obj, "trace_origin", None)
+        return None
+
+    def _lane_of(self, obj: Any) -> Optional[str]:
+        agent = self.agent
+        if obj is agent.model:
+            return "agent"
+        if obj is agent.storage:
+            return "storage"
+        memory = agent.memory
+        if memory is not None:
+            if obj is getattr(memory, "db", None):
+                return "memory"
+            if obj is getattr(memory, "model", None):
+                return "memory_model"
+            memory_manager = getattr(memory, "memory_manager", None)
+            if memory_manager is not None and obj is memory_manager.model:
+                return "memory_manager"
+            summary_manager = getattr(memory, "summary_manager", None)
+            if summary_manager is not None and obj is summary_manager.model:
+                return "session_summary"
+        return None
+
+    def observe(self, response: Any) -> None:
+        """
+        Take the session and run id agno assigned from a run response or stream event, since the
+        agent's own attributes are shared with concurrent runs.
+        """
+        self.session_id = self.session_id or getattr(response, "session_id", None)
+        self.run_id = self.run_id or getattr(response, "run_id", None)
+
+    def record(self, kind: str, **fields) -> None:
+        event = {"type": kind, "t_ms": round((time.time() - self.started_at) * 1000, 2), **fields}
+        with self._lock:
+            self.events.append(event)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "agent_id": self.agent_id,
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "run_id": self.run_id,
+            "entrypoint": self.entrypoint,
+            "message": self.message,
+            "images": self.images,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "events": self.events,
+        }
+
+
+class TraceRecorder:
+    """
+    Records agent turns to `<directory>/<session_id>.jsonl` (one turn per line), or keeps them
+    in `turns` when no directory is given.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.turns: List[Dict[str, Any]] = []
+        self._active: Dict[int, TurnTrace] = {}
+        self._lock = threading.Lock()
+
+    def start_turn(self, agent, message: Any, run_kwargs: Dict[str, Any]) -> TurnTrace:
+        turn = TurnTrace(agent, message, run_kwargs)
+        with self._lock:
+            self._active[id(turn)] = turn
+        return turn
+
+    def finish_turn(self, turn: TurnTrace, response: Any = None) -> None:
+        with self._lock:
+            self._active.pop(id(turn), None)
+        if response is not None:
+            turn.observe(response)
+        turn.duration_ms = round((time.time() - turn.started_at) * 1000, 2)
+        record = turn.to_dict()
+
+        with self._lock:
+            if self.directory is None:
+                self.turns.append(record)
+            else:
+                with open(self.trace_path(turn.session_id), "a", encoding="utf-8") as trace_file:
+                    trace_file.write(json.dumps(record, default=str) + "\n")
+
+    def trace_path(self, session_id: Optional[str]) -> Path:
+        """
+        File of a session's turns. Session ids come from clients, so anything but a plain id is hashed.
+        """
+        if session_id is None:
+            name = "no-session"
+        elif SAFE_SESSION_ID.match(session_id):
+            name = session_id
+        else:
+            name = "session-" + hashlib.sha256(str(session_id).encode("utf-8")).hexdigest()[:32]
+        path = (self.directory / f"{name}.jsonl").resolve()
+        if path.parent != self.directory.resolve():
+            raise ValueError(f"Trace path for session {session_id!r} escapes {self.directory}")
+        return path
+
+    def turn_for(self, obj: Any) -> Tuple[Optional[TurnTrace], Optional[str]]:
+        """
+        The turn and lane `obj` is working for: the turn running in the current context, otherwise
+        the only active turn `obj` belongs to. Concurrent runs share the singleton agents, so an
+        ambiguous identity match is dropped rather than attributed to the wrong session.
+        """
+        turn = _current_turn.get()
+        if turn is not None:
+            lane = turn.lane_of(obj)
+            if lane is not None:
+                return turn, lane
+
+        with self._lock:
+            active = list(self._active.values())
+        matches = [(turn, lane) for turn in active for lane in [turn.lane_of(obj)] if lane is not None]
+        return matches[0] if len(matches) == 1 else (None, None)
+
+    def wrap_client(self, client, model) -> "RecordingClient":
+        return RecordingClient(client, model, self)
+
+    def traced_stream(self, turn: TurnTrace, stream):
+        try:
+            while True:
+                token = _current_turn.set(turn)
+                try:
+                    event = next(stream)
+                except StopIteration:
+                    return
+                finally:
+                    _current_turn.reset(token)
+                turn.observe(event)
+                yield event
+        finally:
+            stream.close()
+            self.finish_turn(turn)
+
+    async def atraced_stream(self, turn: TurnTrace, stream):
+        try:
+            while True:
+                token = _current_turn.set(turn)
+                try:
+                    event = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _current_turn.reset(token)
+                turn.observe(event)
+                yield event
+        finally:
+            await stream.aclose()
+            self.finish_turn(turn)
+
+
+_recorder: Optional[TraceRecorder] = TraceRecorder(os.getenv("AGENT_TRACE_DIR")) if os.getenv("AGENT_TRACE_DIR") else None
+
+
+def get_trace_recorder() -> Optional[TraceRecorder]:
+    return _recorder
+
+
+def set_trace_recorder(recorder: Optional[TraceRecorder]) -> None:
+    global _recorder
+    _recorder = recorder
+
+
+def record_event(owner: Any, kind: str, **fields) -> None:
+    """
+    Attach an event to the active turn that `owner` (a model, storage or memory db) belongs to.
+    """
+    if _recorder is None:
+        return
+    turn, lane = _recorder.turn_for(owner)
+    if turn is not None:
+        turn.record(kind, lane=lane, **fields)
+
+
+class _RecordingModels:
+    def __init__(self, models, model, recorder: TraceRecorder):
+        self._models = models
+        self._model = model
+        self._recorder = recorder
+
+    def _record(self, method: str, contents, config, started: float, chunks: List[Any]) -> None:
+        turn, lane = self._recorder.turn_for(self._model)
+        if turn is None:
+            return
+        request = request_sections(contents, config)
+        prompt_chars = section_sizes(request)
+        images = prompt_chars.pop("images")
+        tokens = estimate_tokens(prompt_chars, images)
+        usage = _dump(getattr(chunks[-1], "usage_metadata", None)) if chunks else None
+        turn.record(
+            "model_call",
+            lane=lane,
+            method=method,
+            model=self._model.id,
+            est_input_tokens=tokens,
+            images=images,
+            prompt_chars=prompt_chars,
+            request=request,
+            usage=usage,
+            duration_ms=round((time.time() - started) * 1000, 2),
+            chunks=[_dump(chunk) for chunk in chunks],
+        )
+
+    def generate_content(self, *, model, contents, config=None, **kwargs):
+        started = time.time()
+        response = self._models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        self._record("generate_content", contents, config, started, [response])
+        return response
+
+    def generate_content_stream(self, *, model, contents, config=None, **kwargs):
+        started = time.time()
+        chunks = []
+        try:
+            for chunk in self._models.generate_content_stream(model=model, contents=contents, config=config, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            self._record("generate_content_stream", contents, config, started, chunks)
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class _AsyncRecordingModels(_RecordingModels):
+    async def generate_content(self, *, model, contents, config=None, **kwargs):
+        started = time.time()
+        response = await self._models.generate_content(model=model, contents=contents, config=config, **kwargs)
+        self._record("generate_content", contents, config, started, [response])
+        return response
+
+    async def generate_content_stream(self, *, model, contents, config=None, **kwargs):
+        started = time.time()
+        stream = await self._models.generate_content_stream(model=model, contents=contents, config=config, **kwargs)
+        return self._recorded_stream(stream, contents, config, started)
+
+    async def _recorded_stream(self, stream, contents, config, started):
+        chunks = []
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            self._record("generate_content_stream", contents, config, started, chunks)
+
+
+class _AsyncRecordingClient:
+    def __init__(self, aio, model, recorder: TraceRecorder):
+        self._aio = aio
+        self.models = _AsyncRecordingModels(aio.models, model, recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._aio, name)
+
+
+class RecordingClient:
+    """
+    Proxy over a google-genai client that records every generate_content call made by `model`.
+    """
+
+    def __init__(self, client, model, recorder: TraceRecorder):
+        self._client = client
+        self.models = _RecordingModels(client.models, model, recorder)
+        self.aio = _AsyncRecordingClient(client.aio, model, recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class TracedAgentMixin:
+    """
+    Agent mixin that records each run as a turn while a trace recorder is active. The turn is
+    carried in a context variable for the duration of the run and of each streamed step.
+    """
+
+    def run(self, message=None, **kwargs):
+        recorder = get_trace_recorder()
+        if recorder is None:
+            return super().run(message, **kwargs)
+
+        turn = recorder.start_turn(self, message, kwargs)
+        token = _current_turn.set(turn)
+        try:
+            result = super().run(message, **kwargs)
+        except Exception:
+            recorder.finish_turn(turn)
+            raise
+        finally:
+            _current_turn.reset(token)
+        if inspect.isgenerator(result):
+            return recorder.traced_stream(turn, result)
+        recorder.finish_turn(turn, result)
+        return result
+
+    async def arun(self, message=None, **kwargs):
+        recorder = get_trace_recorder()
+        if recorder is None:
+            return await super().arun(message, **kwargs)
+
+        turn = recorder.start_turn(self, message, kwargs)
+        token = _current_turn.set(turn)
+        try:
+            result = await super().arun(message, **kwargs)
+        except Exception:
+            recorder.finish_turn(turn)
+            raise
+        finally:
+            _current_turn.reset(token)
+        if inspect.isasyncgen(result):
+            return recorder.atraced_stream(turn, result)
+        recorder.finish_turn(turn, result)
+        return result
+
+
+class TracedMemory(Memory):
+    """
+    Memory whose entry points agno submits to its thread pool carry the caller's context, so
+    memory work done on worker threads is attributed to the turn that started it.
+    """
+
+    @property
+    def create_user_memories(self):
+        return functools.partial(contextvars.copy_context().run, super().create_user_memories)
+
+    @property
+    def create_session_summary(self):
+        return functools.partial(contextvars.copy_context().run, super().create_session_summary)
+
+
+def traced_entrypoint(func):
+    """
+    Mark an agent method (e.g. `interview`) as a replayable entry point: its name and arguments
+    are stored with the turn so the replayer can call it again instead of `run`.
+    """
+    signature = inspect.signature(func)
+
+    def bind(self, args, kwargs) -> Dict[str, Any]:
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        return {"name": func.__name__, "args": {k: v for k, v in bound.arguments.items() if k != "self"}}
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            token = _entrypoint.set(bind(self, args, kwargs))
+            try:
+                return await func(self, *args, **kwargs)
+            finally:
+                _entrypoint.reset(token)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        token = _entrypoint.set(bind(self, args, kwargs))
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            _entrypoint.reset(token)
+    return wrapper
+
+
+class TracedSqliteMemoryDb(SqliteMemoryDb):
+    """
+    SqliteMemoryDb that reports reads and writes to the active turn.
+    """
+
+    def read_memories(self, *args, **kwargs):
+        started = time.time()
+        memories = super().read_memories(*args, **kwargs)
+        record_event(self, "memory", op="read", rows=len(memories), duration_ms=round((time.time() - started) * 1000, 2))
+        return memories
+
+    def upsert_memory(self, memory, *args, **kwargs):
+        started = time.time()
+        result = super().upsert_memory(memory, *args, **kwargs)
+        record_event(self, "memory", op="upsert", duration_ms=round((time.time() - started) * 1000, 2))
+        return result
+
+    def delete_memory(self, memory_id: str):
+        started = time.time()
+        result = super().delete_memory(memory_id)
+        record_event(self, "memory", op="delete", duration_ms=round((time.time() - started) * 1000, 2))
+        return result
+
+
+def summarize_turn(turn: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Per-turn cost figures compared between recorded and replayed runs.
+    """
+    model_calls = [event for event in turn["events"] if event["type"] == "model_call"]
+    storage = [event for event in turn["events"] if event["type"] == "storage"]
+    calls_by_lane: Dict[str, int] = {}
+    prompt_chars: Dict[str, int] = {}
+    for event in model_calls:
+        calls_by_lane[event["lane"]] = calls_by_lane.get(event["lane"], 0) + 1
+        for section, chars in (event.get("prompt_chars") or {}).items():
+            prompt_chars[section] = prompt_chars.get(section, 0) + chars
+    return {
+        "model_calls": len(model_calls),
+        "model_calls_by_lane": calls_by_lane,
+        "prompt_chars": prompt_chars,
+        "tokens_sent": sum(event["est_input_tokens"] for event in model_calls),
+        "storage_ops": len(storage),
+        "storage_bytes_written": sum(event.get("bytes_written", 0) for event in storage),
+        "memory_ops": sum(1 for event in turn["events"] if event["type"] == "memory"),
+    }
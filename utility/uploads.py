@@ -0,0 +1,354 @@
+import os
+import re
+import time
+import uuid
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Set
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import Column, MetaData, Table
+from sqlalchemy.sql.expression import select
+from sqlalchemy.sql.functions import func
+from sqlalchemy.types import Integer, String
+
+UPLOAD_ROOT = os.getenv("UPLOAD_ROOT", "uploads")
+UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_RETENTION_SECONDS = int(os.getenv("UPLOAD_RETENTION_SECONDS", str(7 * 24 * 3600)))
+UPLOAD_REAP_INTERVAL_SECONDS = int(os.getenv("UPLOAD_REAP_INTERVAL_SECONDS", "3600"))
+
+CHUNK_SIZE = 1024 * 1024
+# Temp files older than this are leftovers of interrupted uploads (writes keep in-flight ones fresh)
+TMP_MAX_AGE_SECONDS = 3600
+SHARD_DIR = re.compile(r"^[0-9a-f]{2}$")
+
+
+class UploadQuotaExceeded(Exception):
+    """Raised when an upload would take a user over their byte quota."""
+
+
+@dataclass
+class UploadRecord:
+    upload_id: str
+    user_id: str
+    session_id: Optional[str]
+    original_name: Optional[str]
+    path: str
+    sha256: str
+    size_bytes: int
+    created_at: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class UploadStore:
+    """
+    Content-addressed upload storage.
+
+    Files live at `<root>/<h[0:2]>/<h[2:4]>/<sha256><ext>`, so identical uploads share one file and
+    no directory grows with the number of users. Ownership is tracked in an `uploads` table next to
+    the agent session storage, which is what per-user quotas and the reaper work from.
+    """
+
+    def __init__(
+        self,
+        root: str = UPLOAD_ROOT,
+        db_file: Optional[str] = None,
+        session_table: str = "shared_storage",
+        quota_bytes: int = UPLOAD_QUOTA_BYTES,
+        retention_seconds: int = UPLOAD_RETENTION_SECONDS,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        if db_file is not None:
+            db_path = Path(db_file).resolve()
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.db_engine = create_engine(f"sqlite:///{db_path}")
+        else:
+            # One shared connection, or every thread would see its own empty in-memory database
+            self.db_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        self.table = Table(
+            "uploads",
+            MetaData(),
+            Column("upload_id", String, primary_key=True),
+            Column("user_id", String, index=True),
+            Column("session_id", String, index=True, nullable=True),
+            Column("original_name", String, nullable=True),
+            Column("path", String, index=True),
+            Column("sha256", String),
+            Column("size_bytes", Integer),
+            Column("created_at", Integer),
+        )
+        self.table.create(self.db_engine, checkfirst=True)
+
+        self.session_table = session_table
+        self.quota_bytes = quota_bytes
+        self.retention_seconds = retention_seconds
+
+        self.reclaimed_bytes_total = 0
+        self.reaped_files_total = 0
+        self.last_reap_at: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def shard_path(self, sha256: str, extension: str) -> Path:
+        return self.root / sha256[:2] / sha256[2:4] / f"{sha256}{extension}"
+
+    @staticmethod
+    def clean_extension(filename: Optional[str]) -> str:
+        extension = os.path.splitext(filename or "")[1].lower()
+        return extension if re.fullmatch(r"\.[a-z0-9]{1,10}", extension) else ""
+
+    def user_usage(self, user_id: str) -> int:
+        with self.db_engine.connect() as conn:
+            return conn.execute(
+                select(func.coalesce(func.sum(self.table.c.size_bytes), 0)).where(self.table.c.user_id == user_id)
+            ).scalar()
+
+    def save(self, fileobj: BinaryIO, filename: Optional[str], user_id: str, session_id: Optional[str] = None) -> UploadRecord:
+        """
+        Stream an upload into the sharded store, enforcing the user's byte quota.
+
+        Raises:
+            UploadQuotaExceeded: If the upload would exceed the user's quota.
+        """
+        tmp_dir = self.root / "tmp"
+        tmp_dir.mkdir(exist_ok=True)
+        remaining = self.quota_bytes - self.user_usage(user_id)
+
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+            try:
+                while chunk := fileobj.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > remaining:
+                        raise UploadQuotaExceeded(
+                            f"Upload quota of {self.quota_bytes} bytes exceeded for user {user_id}"
+                        )
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            except Exception:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+
+        sha256 = digest.hexdigest()
+        path = self.shard_path(sha256, self.clean_extension(filename))
+        with self._lock:
+            # Concurrent uploads all passed the streaming check, so re-check against committed usage
+            if self.user_usage(user_id) + size > self.quota_bytes:
+                os.unlink(tmp.name)
+                raise UploadQuotaExceeded(f"Upload quota of {self.quota_bytes} bytes exceeded for user {user_id}")
+            if path.exists():
+                os.unlink(tmp.name)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp.name, path)
+
+            record = UploadRecord(
+                upload_id=str(uuid.uuid4()),
+                user_id=user_id,
+                session_id=session_id or None,
+                original_name=filename,
+                path=str(path),
+                sha256=sha256,
+                size_bytes=size,
+                created_at=int(time.time()),
+            )
+            with self.db_engine.begin() as conn:
+                conn.execute(self.table.insert().values(**record.to_dict()))
+        return record
+
+    def attach_session(self, upload_id: str, session_id: str) -> None:
+        """
+        Link an upload to the agent session it was used in, once that session id is known.
+        """
+        with self.db_engine.begin() as conn:
+            conn.execute(self.table.update().where(self.table.c.upload_id == upload_id).values(session_id=session_id))
+
+    def reap(self, now: Optional[int] = None) -> Dict[str, int]:
+        """
+        Expire uploads older than the retention period whose session has had no activity within it,
+        and delete files no remaining upload points to. Also sweeps the legacy flat `uploads/{user_id}/`
+        directories under the same liveness rule, and temp files left by interrupted uploads.
+        """
+        now = now or int(time.time())
+        cutoff = now - self.retention_seconds
+        reclaimed_bytes = 0
+        reaped_files = 0
+
+        # Only the DB expiry and the unlink of sharded files race with `save()`
+        with self._lock:
+            with self.db_engine.begin() as conn:
+                live_session = ""
+                if self._has_table(conn, self.session_table):
+                    live_session = (
+                        f"AND NOT EXISTS (SELECT 1 FROM {self.session_table} s WHERE s.session_id = u.session_id "
+                        "AND COALESCE(s.updated_at, s.created_at) >= :cutoff)"
+                    )
+                expired = conn.execute(
+                    text(f"SELECT u.upload_id, u.path FROM uploads u WHERE u.created_at < :cutoff {live_session}"),
+                    {"cutoff": cutoff},
+                ).fetchall()
+                if expired:
+                    conn.execute(self.table.delete().where(self.table.c.upload_id.in_([row.upload_id for row in expired])))
+
+                for path in {row.path for row in expired}:
+                    still_referenced = conn.execute(
+                        select(self.table.c.upload_id).where(self.table.c.path == path).limit(1)
+                    ).fetchone()
+                    if still_referenced is None:
+                        reclaimed_bytes += self._remove_file(Path(path))
+                        reaped_files += 1
+
+        legacy_bytes, legacy_files = self._sweep_legacy(cutoff)
+        tmp_bytes, tmp_files = self._sweep_tmp(now - TMP_MAX_AGE_SECONDS)
+        reclaimed_bytes += legacy_bytes + tmp_bytes
+        reaped_files += legacy_files + tmp_files
+
+        with self._lock:
+            self.reclaimed_bytes_total += reclaimed_bytes
+            self.reaped_files_total += reaped_files
+            self.last_reap_at = now
+
+        print(f"[DEBUG] Upload reaper removed {reaped_files} file(s), reclaimed {reclaimed_bytes} bytes")
+        return {"reaped_files": reaped_files, "reclaimed_bytes": reclaimed_bytes}
+
+    @staticmethod
+    def _has_table(conn, name: str) -> bool:
+        return conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"), {"name": name}
+        ).fetchone() is not None
+
+    def _referenced_by_live_sessions(self, file_names: Set[str], cutoff: int) -> Set[str]:
+        """
+        Those of `file_names` that a session active since `cutoff` mentions, e.g. as an
+        `Image(filepath=...)` in one of its runs (runs table) or in a legacy session blob.
+        """
+        with self.db_engine.connect() as conn:
+            if not file_names or not self._has_table(conn, self.session_table):
+                return set()
+            live = "COALESCE(s.updated_at, s.created_at) >= :cutoff"
+            queries = [f"SELECT s.memory FROM {self.session_table} s WHERE {live}"]
+            runs_table = f"{self.session_table}_runs"
+            if self._has_table(conn, runs_table):
+                queries.append(
+                    f"SELECT r.run FROM {runs_table} r JOIN {self.session_table} s ON s.session_id = r.session_id "
+                    f"WHERE {live}"
+                )
+            # Longest first, so a name that is a prefix of another does not hide it
+            pattern = re.compile("|".join(re.escape(name) for name in sorted(file_names, key=len, reverse=True)))
+            referenced: Set[str] = set()
+            for (blob,) in conn.execute(text(" UNION ALL ".join(queries)), {"cutoff": cutoff}):
+                if blob:
+                    referenced.update(pattern.findall(blob if isinstance(blob, str) else str(blob)))
+            return referenced
+
+    def _remove_file(self, path: Path) -> int:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        # Drop the shard directories once they are empty
+        for parent in (path.parent, path.parent.parent):
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+        return size
+
+    def _sweep_legacy(self, cutoff: int):
+        reclaimed_bytes = 0
+        reaped_files = 0
+        legacy_dirs = [
+            entry for entry in self.root.iterdir()
+            if entry.is_dir() and not SHARD_DIR.match(entry.name) and entry.name != "tmp"
+        ]
+        stale = []
+        for entry in legacy_dirs:
+            for file_path in entry.rglob("*"):
+                try:
+                    if file_path.is_file() and file_path.stat().st_mtime < cutoff:
+                        stale.append(file_path)
+                except FileNotFoundError:
+                    continue
+
+        referenced = self._referenced_by_live_sessions({file_path.name for file_path in stale}, cutoff)
+        for file_path in stale:
+            if file_path.name in referenced:
+                continue
+            size = self._remove_file_only(file_path)
+            if size is not None:
+                reclaimed_bytes += size
+                reaped_files += 1
+        for entry in legacy_dirs:
+            if entry.is_dir() and not any(entry.iterdir()):
+                shutil.rmtree(entry, ignore_errors=True)
+        return reclaimed_bytes, reaped_files
+
+    def _sweep_tmp(self, cutoff: float):
+        reclaimed_bytes = 0
+        reaped_files = 0
+        tmp_dir = self.root / "tmp"
+        if tmp_dir.is_dir():
+            for file_path in tmp_dir.iterdir():
+                try:
+                    if not file_path.is_file() or file_path.stat().st_mtime >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                size = self._remove_file_only(file_path)
+                if size is not None:
+                    reclaimed_bytes += size
+                    reaped_files += 1
+        return reclaimed_bytes, reaped_files
+
+    @staticmethod
+    def _remove_file_only(path: Path) -> Optional[int]:
+        """
+        Delete `path` and return its size, or None when it is already gone.
+        """
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return None
+        return size
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.db_engine.connect() as conn:
+            files = conn.execute(
+                text("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM "
+                     "(SELECT path, MAX(size_bytes) AS size_bytes FROM uploads GROUP BY path)")
+            ).fetchone()
+            users = conn.execute(select(func.count(func.distinct(self.table.c.user_id)))).scalar()
+        return {
+            "disk_usage_bytes": files[1],
+            "file_count": files[0],
+            "user_count": users,
+            "quota_bytes_per_user": self.quota_bytes,
+            "retention_seconds": self.retention_seconds,
+            "reclaimed_bytes_total": self.reclaimed_bytes_total,
+            "reaped_files_total": self.reaped_files_total,
+            "last_reap_at": self.last_reap_at,
+        }
+
+
+async def run_reaper(store: UploadStore, interval_seconds: int = UPLOAD_REAP_INTERVAL_SECONDS) -> None:
+    """
+    Background task running `store.reap()` every `interval_seconds` off the event loop.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(store.reap)
+        except Exception as e:
+            print(f"[ERROR] Upload reaper failed: {e}")
+        await asyncio.sleep(interval_seconds)
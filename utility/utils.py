@@ -1,8 +1,8 @@
 import os
-from agno.memory.v2 import Memory
-from agno.memory.v2.db.sqlite import SqliteMemoryDb
-from agno.storage.sqlite import SqliteStorage
-from agno.models.google import Gemini
+from utility.tracing import TracedSqliteMemoryDb
+from utility.session_memory import SharedMemory
+from utility.run_storage import SqliteRunStorage
+from utility.gemini_client import SharedGemini
 import uuid
 import json
 from agno.workflow import WorkflowRunResponseEvent
@@ -10,11 +10,11 @@ from typing import Iterator
 
 def shared_memory():
     
-    memory = Memory(db=SqliteMemoryDb(table_name="shared_memories", db_file=os.getenv("MEMORY_DB_FILE")), model=Gemini(os.getenv("GEMINI_MODEL")))
+    memory = SharedMemory(db=TracedSqliteMemoryDb(table_name="shared_memories", db_file=os.getenv("MEMORY_DB_FILE")), model=SharedGemini(id=os.getenv("GEMINI_MODEL")))
     return memory
 
-def shared_storage():
-    return SqliteStorage(table_name="shared_storage", db_file=os.getenv("STORAGE_DB_FILE"))
+def shared_storage(num_history_runs: int = 5):
+    return SqliteRunStorage(table_name="shared_storage", db_file=os.getenv("STORAGE_DB_FILE"), num_history_runs=num_history_runs)
 
 def generate_user_id():
     """